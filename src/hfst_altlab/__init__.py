@@ -1,9 +1,29 @@
 import hfst
 import gzip
+import functools
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from .types import Analysis, FullAnalysis, Wordform, as_fst_input, fst_output_format
 from typing import cast, Optional
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
+from itertools import filterfalse, islice
+
+# Formats that hfst can already use for fast lookup.
+_OPTIMIZED_TYPES = frozenset(
+    {
+        hfst.ImplementationType.HFST_OL_TYPE,
+        hfst.ImplementationType.HFST_OLW_TYPE,
+    }
+)
 
 
 class TransducerFile:
@@ -18,38 +38,121 @@ class TransducerFile:
 
     :param filename: The path of the transducer
     :param search_cutoff: The maximum amount of time (in seconds) that the search will go on for.  The intention of a limit is to avoid search getting stuck.  Defaults to a minute.
+    :param cache_size: How many distinct inputs to remember the FST output for.  Lookups are pure functions of the input (and of the cutoff), so repeated inputs (common when processing corpora) are answered without traversing the FST again.  Lookups that reach the cutoff may be incomplete, so they are not remembered.  Use ``0`` to disable the cache.
+    :param save_optimized: If the file needs to be optimized for lookup, store the optimized version next to it (as ``filename.hfstol``) so that it is loaded directly next time.  Nothing is stored if the directory is not writable.  The stored version is used as long as it is not older than the original file, judging only by their modification times, and as long as it still matches the size and checksum recorded when it was stored (in ``filename.hfstol.json``).
     """
 
-    def __init__(self, filename: Path | str, search_cutoff: int = 60):
+    def __init__(
+        self,
+        filename: Path | str,
+        search_cutoff: int = 60,
+        cache_size: int = 4096,
+        save_optimized: bool = True,
+    ):
         self.cutoff = search_cutoff
+        self._filename = filename
+        self._inverted = False
+        self._cache_size = cache_size
+        self._save_optimized = save_optimized
 
-        if not Path(filename).exists():
+        path = Path(filename)
+        if not path.exists():
             exn = FileNotFoundError(f"Transducer not found: ‘{str(filename)}’")
             raise exn
 
+        # Workaround for FOMABIN formats
+        with open(filename, "rb") as f:
+            if f.read(3) == b"\x1f\x8b\x08":
+                # It is a gzipped file!
+                print(
+                    "\n".join(
+                        [
+                            f"The Transducer file {filename} is compressed.",
+                            "Unfortunately, our library cannot currently handle directly compressed files (e.g. .fomabin).",
+                            "Please decompress the file first.",
+                            "If you don't know how, you can use the hfst_altlab.decompress_foma function as follows:\n\n",
+                            "from hfst_altlab import decompress_foma",
+                            'with open(output_name, "wb") as f:',
+                            f'  with decompress_foma("{str(filename)}") as fst:',
+                            f"    f.write(fst.read())\n\n",
+                        ]
+                    )
+                )
+                raise ValueError(filename)
+
         # Now we extract the transducer and store it.
+        # Loading the same file twice (e.g. in TransducerPair.duplicate) reuses the parsed transducer.
+        self.transducer = TransducerFile._load(
+            path.resolve(), path.stat().st_mtime_ns, save_optimized
+        )
+        self._cached_lookup = _cached_transduction(self.transducer, cache_size)
+
+        self._read_alphabet()
+
+    def _read_alphabet(self) -> None:
+        """
+        Internal Function. Store the alphabet of the transducer and the sets of symbols derived from it.
+        The alphabet is fixed once the transducer is loaded, so we only ask hfst for it (and check each symbol with it) once.
+        """
+        self._alphabet = frozenset(self.transducer.get_alphabet())
+        self._symbol_count = len(self._alphabet)
+        self._diacritic_symbols = frozenset(
+            x for x in self._alphabet if hfst.is_diacritic(x)
+        )
+        # Symbols that never make it into a concatenated output string.
+        self._hidden_symbols = self._diacritic_symbols | {"@_EPSILON_SYMBOL_@"}
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _load(
+        filename: Path, modified: int, save_optimized: bool
+    ) -> hfst.HfstTransducer:
+        """
+        Internal Function. Read the single transducer stored in a file, optimizing it for lookup if needed.
+        The result is shared by every :py:class:`hfst_altlab.TransducerFile` built from the same file, so it must not be modified in place.
+
+        :param filename: The resolved path of the transducer.
+        :param modified: The modification time of the file, so that a rebuilt FST is read again.
+        :param save_optimized: Whether to store the transducer next to the file if it had to be optimized.
+        """
+        # A previously optimized version is only used if it is at least as new as the original file.
+        # Only the modification times are compared, so copies that preserve them (e.g. ``cp -p`` or
+        # extracting an archive) can keep an outdated optimized version in use.
+        optimized = filename.with_name(filename.name + ".hfstol")
+        saved = None
+        if optimized.exists() and optimized.stat().st_mtime_ns >= modified:
+            saved = TransducerFile._read_optimized(optimized)
+            if saved is None:
+                print(f"Loading {filename} instead.")
+
+        if saved is None:
+            transducer = TransducerFile._read(filename)
+            infinitely_ambiguous = transducer.is_infinitely_ambiguous()
+        else:
+            # is_infinitely_ambiguous() is always False for optimized transducers, so we use what we recorded when saving.
+            transducer, infinitely_ambiguous = saved
+        if infinitely_ambiguous:
+            print(f"Warning: The transducer at {filename} is infinitely ambiguous.")
+        if transducer.get_type() not in _OPTIMIZED_TYPES:
+            print("Transducer not optimized.  Optimizing...")
+            transducer.convert(hfst.ImplementationType.HFST_OLW_TYPE)
+            transducer.lookup_optimize()
+            print("Done.")
+            if save_optimized:
+                TransducerFile._save(
+                    transducer, optimized, filename, infinitely_ambiguous
+                )
+        return transducer
+
+    @staticmethod
+    def _read(filename: Path) -> hfst.HfstTransducer:
+        """
+        Internal Function. Read the single transducer stored in a file.
+
+        :param filename: The path of the transducer.
+        """
         try:
-            # Workaround for FOMABIN formats
-            with open(filename, "rb") as f:
-                if f.read(3) == b"\x1f\x8b\x08":
-                    # It is a gzipped file!
-                    print(
-                        "\n".join(
-                            [
-                                f"The Transducer file {filename} is compressed.",
-                                "Unfortunately, our library cannot currently handle directly compressed files (e.g. .fomabin).",
-                                "Please decompress the file first.",
-                                "If you don't know how, you can use the hfst_altlab.decompress_foma function as follows:\n\n",
-                                "from hfst_altlab import decompress_foma",
-                                'with open(output_name, "wb") as f:',
-                                f'  with decompress_foma("{str(filename)}") as fst:',
-                                f"    f.write(fst.read())\n\n",
-                            ]
-                        )
-                    )
-                    raise ValueError(filename)
-                else:
-                    stream = hfst.HfstInputStream(str(filename))
+            stream = hfst.HfstInputStream(str(filename))
         except hfst.exceptions.NotTransducerStreamException as e:
             # Expected message for backwards compatibility.
             e.args = ("wrong or corrupt file?",)
@@ -57,38 +160,174 @@ class TransducerFile:
 
         transducers = stream.read_all()
         if not len(transducers) == 1:
-            error = ValueError(self)
+            error = ValueError(filename)
             error.add_note("We expected a single transducer to arise in the file.")
             stream.close()
             raise error
 
         stream.close()
-        self.transducer = transducers[0]
-        if self.transducer.is_infinitely_ambiguous():
-            print(f"Warning: The transducer at {filename} is infinitely ambiguous.")
-        if not (
-            self.transducer.get_type()
-            in [
-                hfst.ImplementationType.HFST_OL_TYPE,
-                hfst.ImplementationType.HFST_OLW_TYPE,
-            ]
-        ):
-            print("Transducer not optimized.  Optimizing...")
-            self.transducer.convert(hfst.ImplementationType.HFST_OLW_TYPE)
-            self.transducer.lookup_optimize()
-            print("Done.")
+        return transducers[0]
+
+    @staticmethod
+    def _read_optimized(filename: Path) -> tuple[hfst.HfstTransducer, bool] | None:
+        """
+        Internal Function. Read a transducer stored by :py:meth:`_save`, or warn and return ``None`` if it cannot be used.
+        Along with the transducer, return whether the original transducer was infinitely ambiguous.
+
+        :param filename: The path of the stored transducer.
+        """
+        # hfst aborts the whole process on some damaged files (e.g. truncated ones),
+        # so we check the size and checksum recorded when saving before handing the file to hfst.
+        try:
+            with open(filename.with_name(filename.name + ".json")) as f:
+                record = json.load(f)
+            infinitely_ambiguous = record["infinitely_ambiguous"]
+            saved = bool(
+                record["size"] == filename.stat().st_size
+                and record["sha256"] == _sha256(filename)
+                and isinstance(infinitely_ambiguous, bool)
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            saved = False
+        if not saved:
+            print(
+                f"Warning: The optimized transducer at {filename} has changed since it was saved."
+            )
+            return None
 
-    def bulk_lookup(self, words: list[str]) -> dict[str, set[str]]:
+        try:
+            transducer = TransducerFile._read(filename)
+        except (hfst.exceptions.HfstException, ValueError):
+            print(f"Warning: Cannot read the optimized transducer at {filename}.")
+            return None
+        if transducer.get_type() not in _OPTIMIZED_TYPES:
+            print(f"Warning: The transducer at {filename} is not optimized.")
+            return None
+        return transducer, infinitely_ambiguous
+
+    @staticmethod
+    def _save(
+        transducer: hfst.HfstTransducer,
+        filename: Path,
+        source: Path,
+        infinitely_ambiguous: bool,
+    ) -> None:
+        """
+        Internal Function. Store an optimized transducer, so that the optimization is not repeated every time the original file is loaded.
+
+        :param transducer: The optimized transducer.
+        :param filename: Where to store the transducer.  Nothing is stored if the directory is not writable.
+        :param source: The original file, whose permissions are given to the stored transducer.
+        :param infinitely_ambiguous: Whether the original transducer is infinitely ambiguous, which cannot be checked on the optimized one.
+        """
+        # hfst only reports failed writes on stderr, so we check beforehand.
+        if not os.access(filename.parent, os.W_OK):
+            return
+        # We write to temporary files first so that nobody reads a partially written FST.
+        temporaries: list[str] = []
+        try:
+            descriptor, temporary = tempfile.mkstemp(
+                dir=filename.parent, suffix=".hfstol"
+            )
+            os.close(descriptor)
+            temporaries.append(temporary)
+            stream = hfst.HfstOutputStream(
+                filename=temporary, type=transducer.get_type()
+            )
+            stream.write(transducer)
+            stream.close()
+            size = os.path.getsize(temporary)
+            if size == 0:
+                return
+            # The size and checksum let us detect a damaged file before reading it.
+            descriptor, temporary_record = tempfile.mkstemp(
+                dir=filename.parent, suffix=".json"
+            )
+            temporaries.append(temporary_record)
+            with os.fdopen(descriptor, "w") as f:
+                json.dump(
+                    {
+                        "size": size,
+                        "sha256": _sha256(Path(temporary)),
+                        "infinitely_ambiguous": infinitely_ambiguous,
+                    },
+                    f,
+                )
+            # mkstemp only lets the owner read the files, but anyone who can read the original should be able to use them.
+            mode = stat.S_IMODE(source.stat().st_mode)
+            for path in temporaries:
+                os.chmod(path, mode)
+            # A reader that finds the new record next to the previous transducer just loads the original file.
+            os.replace(temporary_record, filename.with_name(filename.name + ".json"))
+            os.replace(temporary, filename)
+        except (OSError, hfst.exceptions.HfstException):
+            return
+        finally:
+            for path in temporaries:
+                Path(path).unlink(missing_ok=True)
+        print(f"Saved the optimized transducer to {filename}.")
+
+    def bulk_lookup(
+        self,
+        words: list[str],
+        *,
+        workers: int | None = None,
+        mp_context: multiprocessing.context.BaseContext | None = None,
+    ) -> dict[str, set[str]]:
         """
         Like ``lookup()`` but applied to multiple inputs. Useful for generating multiple
         surface forms.
 
         .. note:: Backwards-compatible with ``hfst-optimized-lookup``
 
+        .. note:: The ``hfst`` python bindings hold the GIL during lookup, so threads do not speed it up.
+            When ``workers`` is larger than one, the words are split among that many processes instead.
+            If the processes are started with ``fork``, they share the transducer this object has already loaded.
+            Otherwise, each process loads its own copy of the transducer, so this only pays off for long lists of words.
+
         :param words: list of words to lookup
+        :param workers: The number of processes to use.  By default, every lookup happens in the current process.
+        :param mp_context: The :py:mod:`multiprocessing` context used to start the processes.  By default, the one for the current start method (see :py:func:`multiprocessing.get_start_method`).
         :return: a dictionary mapping words in the input to a set of its tranductions
         """
-        return {word: set(self.lookup(word)) for word in words}
+        # dict.fromkeys drops repeated words while keeping the input order.
+        unique_words = list(dict.fromkeys(words))
+        # Many words share transductions, so interning them lets all the sets
+        # share the same string objects (and makes comparing them cheaper).
+        intern = sys.intern
+        if workers is None or workers <= 1:
+            lookup = self.lookup
+            return {word: {intern(x) for x in lookup(word)} for word in unique_words}
+
+        initializer: Callable[[], None]
+        # We do not force fork, as it is unsafe in some hosts (e.g. on macOS, or with threads running).
+        context = mp_context or multiprocessing.get_context()
+        if context.get_start_method() == "fork":
+            # Forked processes see this object without pickling it, and the
+            # memory of the transducer is only copied if it is written to.
+            initializer = functools.partial(_share_worker_transducer, self)
+        else:
+            initializer = functools.partial(
+                _load_worker_transducer,
+                self._filename,
+                self.cutoff,
+                self._cache_size,
+                self._save_optimized,
+                self._inverted,
+            )
+
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=initializer
+        ) as executor:
+            transductions = executor.map(
+                _worker_lookup,
+                unique_words,
+                chunksize=max(1, len(unique_words) // (workers * 4)),
+            )
+            return {
+                word: {intern(x) for x in result}
+                for word, result in zip(unique_words, transductions)
+            }
 
     def lookup(self, input: str) -> list[str]:
         """
@@ -101,7 +340,11 @@ class TransducerFile:
         :return: list of analyses as concatenated strings, or an empty list if the input
             cannot be analyzed.
         """
-        return ["".join(transduction) for transduction in self.lookup_symbols(input)]
+        hidden = self._hidden_symbols
+        return [
+            "".join(x for x in tokens if x and x not in hidden)
+            for _, tokens in self._weighted_lookup(input)
+        ]
 
     def lookup_lemma_with_affixes(self, surface_form: str) -> list[Analysis]:
         """
@@ -126,24 +369,29 @@ class TransducerFile:
 
         :param input: The string to lookup.
         """
+        # filter and filterfalse run the loop over the symbols in C.
+        is_hidden = self._hidden_symbols.__contains__
         return [
-            [x for x in analysis.tokens if x and not hfst.is_diacritic(x)]
-            for analysis in self.weighted_lookup_full_analysis(input)
+            list(filterfalse(is_hidden, filter(None, tokens)))
+            for _, tokens in self._weighted_lookup(input)
         ]
 
-    def _weighted_lookup(self, input: str) -> list[tuple[str, tuple[str, ...]]]:
+    def _weighted_lookup(
+        self, input: str, max_number: int = -1
+    ) -> tuple[tuple[float, tuple[str, ...]], ...]:
         """
         Internal Function. Transduce the input string. The result is a list of weighted tranductions. Each
         weighted tranduction is a tuple with a number for the weight and a list of symbols returned in the model; that is, the symbols are
         not concatenated into a single string.
 
         :param input: The string to lookup.
+        :param max_number: The maximum number of tranductions to produce.  By default (``-1``), all of them.
         :return:
         """
-        return cast(
-            list[tuple[str, tuple[str, ...]]],
-            self.transducer.lookup(str(input), time_cutoff=self.cutoff, output="raw"),
-        )
+        try:
+            return self._cached_lookup(str(input), max_number, self.cutoff)
+        except _CutoffReached as reached:
+            return reached.transductions
 
     def weighted_lookup_full_analysis(
         self, wordform: str | Wordform, generator: Optional["TransducerFile"] = None
@@ -158,27 +406,60 @@ class TransducerFile:
         :param wordform: The string to lookup.
         :param generator: The FST that will be used to fill the standardized version of the wordform from the produced analysis.
         """
-        if generator:
+        return list(self.ilookup_full_analysis(wordform, generator))
 
-            def generate(tokens: tuple[str, ...]) -> str | None:
-                entry: str | None = None
-                for _, output in generator._weighted_lookup(fst_output_format(tokens)):
-                    candidate = "".join(x for x in output if x and not hfst.is_diacritic(x))
-                    if entry and entry != candidate:
-                        return None
-                    else:
-                        entry = candidate
-                return entry
+    def ilookup_full_analysis(
+        self, wordform: str | Wordform, generator: Optional["TransducerFile"] = None
+    ) -> Iterator[FullAnalysis]:
+        """
+        Like :py:meth:`hfst_altlab.TransducerFile.weighted_lookup_full_analysis`, but producing the analyses one at a time.
+        When a generator is provided, the standardized version of each analysis is only computed when that analysis is requested,
+        so callers that only need the first few results can stop early.
 
-        else:
+        :param wordform: The string to lookup.
+        :param generator: The FST that will be used to fill the standardized version of the wordform from the produced analysis.
+        """
+        input = as_fst_input(wordform)
+        if generator is None:
+            for weight, tokens in self._weighted_lookup(input):
+                yield FullAnalysis(weight, tokens)
+            return
+
+        diacritics = generator._diacritic_symbols
+        generator_lookup = generator._weighted_lookup
+
+        def surface_form(output: tuple[str, ...]) -> str:
+            return "".join(x for x in output if x and x not in diacritics)
+
+        def standardize(analysis: str) -> str | None:
+            # Two different outputs are enough to know there is no standardized form,
+            # so we only ask the generator for the rest when the first two agree.
+            outputs = generator_lookup(analysis, max_number=2)
+            if len(outputs) == 2:
+                first, second = (surface_form(output) for _, output in outputs)
+                if not first or first == second:
+                    outputs = generator_lookup(analysis)
+            entry: str | None = None
+            for _, output in outputs:
+                candidate = surface_form(output)
+                if entry and entry != candidate:
+                    return None
+                else:
+                    entry = candidate
+            return entry
 
-            def generate(tokens: tuple[str, ...]) -> str | None:
-                return None
+        # Analyses that only differ in their flag diacritics share the same generator input,
+        # so each distinct input is only standardized once per call.
+        standardized: dict[str, str | None] = {}
 
-        return [
-            FullAnalysis(float(weight), tokens, generate(tokens))
-            for weight, tokens in self._weighted_lookup(as_fst_input(wordform))
-        ]
+        def generate(tokens: tuple[str, ...]) -> str | None:
+            analysis = fst_output_format(tokens)
+            if analysis not in standardized:
+                standardized[analysis] = standardize(analysis)
+            return standardized[analysis]
+
+        for weight, tokens in self._weighted_lookup(input):
+            yield FullAnalysis(weight, tokens, generate(tokens))
 
     def weighted_lookup_full_wordform(
         self, analysis: str | FullAnalysis
@@ -190,7 +471,7 @@ class TransducerFile:
         :return:
         """
         return [
-            Wordform(float(weight), tokens)
+            Wordform(weight, tokens)
             for weight, tokens in self._weighted_lookup(as_fst_input(analysis))
         ]
 
@@ -201,7 +482,7 @@ class TransducerFile:
         .. note:: Backwards-compatible with ``hfst-optimized-lookup``
 
         """
-        return len(self.transducer.get_alphabet())
+        return self._symbol_count
 
     def invert(self) -> None:
         """
@@ -214,12 +495,106 @@ class TransducerFile:
         # Unfortunately, hfst does not directly invert hfstol FSTs.
         # We take a detour by changing to a different format.
         # We do not use foma here just in case we are not dealing with a system that has foma.
+        # The loaded transducer might be shared with other objects, so we invert a copy.
+        self.transducer = hfst.HfstTransducer(self.transducer)
         self.transducer.convert(hfst.ImplementationType.SFST_TYPE)
         self.transducer.invert()
         self.transducer.lookup_optimize()
+        # Previous outputs belong to the other direction of the FST.
+        self._cached_lookup = _cached_transduction(self.transducer, self._cache_size)
+        self._read_alphabet()
+        self._inverted = not self._inverted
         return None
 
 
+def _sha256(filename: Path) -> str:
+    """
+    Internal Function. The SHA-256 checksum of a file, as a hexadecimal string.
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _CutoffReached(Exception):
+    """
+    Internal Exception. Carries the transductions of a lookup that reached the time cutoff, which may be incomplete.
+    ``functools.lru_cache`` does not store exceptions, so these transductions are not cached.
+    """
+
+    def __init__(self, transductions: tuple[tuple[float, tuple[str, ...]], ...]):
+        super().__init__()
+        self.transductions = transductions
+
+
+def _cached_transduction(
+    transducer: hfst.HfstTransducer, cache_size: int
+) -> "functools._lru_cache_wrapper[tuple[tuple[float, tuple[str, ...]], ...]]":
+    """
+    Internal Function. Build the cached lookup of a :py:class:`hfst_altlab.TransducerFile`, a direct call to the ``hfst`` library.
+    It only refers to the transducer (and not to the object that uses it), so that the object can be freed as soon as it is no longer used.
+
+    :param transducer: The transducer to lookup on.
+    :param cache_size: How many distinct inputs to remember the output for.
+    """
+
+    def transduce(
+        input: str, max_number: int, cutoff: float
+    ) -> tuple[tuple[float, tuple[str, ...]], ...]:
+        start = time.monotonic()
+        transductions = cast(
+            tuple[tuple[float, tuple[str, ...]], ...],
+            transducer.lookup(
+                input, time_cutoff=cutoff, max_number=max_number, output="raw"
+            ),
+        )
+        # A cutoff of 0 means there is no limit.
+        if 0 < cutoff <= time.monotonic() - start:
+            raise _CutoffReached(transductions)
+        return transductions
+
+    return functools.lru_cache(maxsize=cache_size)(transduce)
+
+
+_worker_transducer: TransducerFile | None = None
+
+
+def _load_worker_transducer(
+    filename: Path | str,
+    search_cutoff: int,
+    cache_size: int,
+    save_optimized: bool,
+    inverted: bool,
+) -> None:
+    """
+    Internal Function. Initializer for the worker processes of :py:meth:`hfst_altlab.TransducerFile.bulk_lookup`.
+    """
+    global _worker_transducer
+    _worker_transducer = TransducerFile(
+        filename, search_cutoff, cache_size, save_optimized
+    )
+    if inverted:
+        _worker_transducer.invert()
+
+
+def _share_worker_transducer(transducer: TransducerFile) -> None:
+    """
+    Internal Function. Initializer for forked worker processes of :py:meth:`hfst_altlab.TransducerFile.bulk_lookup`, which inherit the transducer of the parent process.
+    """
+    global _worker_transducer
+    _worker_transducer = transducer
+
+
+def _worker_lookup(word: str) -> list[str]:
+    """
+    Internal Function. Lookup on the transducer set up by :py:func:`_load_worker_transducer` or :py:func:`_share_worker_transducer`.
+    """
+    assert _worker_transducer is not None
+    return _worker_transducer.lookup(word)
+
+
 class TransducerPair:
     """
     This class provides a useful wrapper to combine an analyser FST and a generator FST for the same language.
@@ -233,11 +608,13 @@ class TransducerPair:
     :param generator: The path to the generator FST (input:analysis, output: wordforms)
     :param search_cutoff: The maximum amount of time allowed for lookup on each transducer.
     :param default_distance: An optional function providing a distance between two strings. (see :py:meth:`hfst_altlab.TransducerPair.analyse`)
+    :param default_batch_distance: An optional function providing the distances between a string and a list of strings, in one call. (see :py:meth:`hfst_altlab.TransducerPair.analyse`)
     """
 
     analyser: TransducerFile
     generator: TransducerFile
     default_distance: None | Callable[[str, str], float]
+    default_batch_distance: None | Callable[[str, list[str]], Iterable[float]]
 
     def __init__(
         self,
@@ -245,13 +622,21 @@ class TransducerPair:
         generator: Path | str,
         search_cutoff: int = 60,
         default_distance: None | Callable[[str, str], float] = None,
+        default_batch_distance: (
+            None | Callable[[str, list[str]], Iterable[float]]
+        ) = None,
     ):
         self.analyser = TransducerFile(analyser, search_cutoff)
         self.generator = TransducerFile(generator, search_cutoff)
         self.default_distance = default_distance
+        self.default_batch_distance = default_batch_distance
 
     def analyse(
-        self, input: Wordform | str, distance: None | Callable[[str, str], float] = None
+        self,
+        input: Wordform | str,
+        distance: None | Callable[[str, str], float] = None,
+        batch_distance: None | Callable[[str, list[str]], Iterable[float]] = None,
+        limit: int | None = None,
     ) -> list[FullAnalysis]:
         """
         Provide a list of analysis for a particular wordform using the analyser FST of this object.
@@ -260,21 +645,59 @@ class TransducerPair:
         the results provided by the FST are sorted using the function to compute a distance between the
         input wordform and the standardized wordform associated with each analysis (the result of applying the generator FST, if unique)
 
+        A `batch_distance` function (or the `default_batch_distance` property) can be used instead.  It receives the input wordform and the list of all the distinct standardized wordforms,
+        and must return their distances in the same order (it is not called when there is nothing to rank).  This allows vectorized or compiled implementations (for example, ``rapidfuzz.process.cdist``) to compute all the distances in a single call.
+        When both kinds of function are available, the batch function is used.
+
         :param input: The wordform to analyse.
         :param distance: The sorting function for this particular method call.  When it is not `None`, it overrides `default_distance`, but only for this particular call.
+        :param batch_distance: The batch sorting function for this particular method call.  Like `distance`, it overrides the defaults of the object, but only for this particular call.
+        :param limit: If provided, only the first `limit` results (after sorting, when sorting) are returned.  Without a distance function, the remaining analyses are not even standardized.
         """
-        candidate = self.analyser.weighted_lookup_full_analysis(input, self.generator)
-        sort_function = distance or self.default_distance
-        if sort_function:
-            # If there is a distance function, use that for sorting
-            source = str(input)
+        candidates = self.analyser.ilookup_full_analysis(input, self.generator)
+        if distance or batch_distance:
+            sort_function, batch_function = distance, batch_distance
+        else:
+            sort_function = self.default_distance
+            batch_function = self.default_batch_distance
+        if not (sort_function or batch_function):
+            return list(islice(candidates, limit))
+
+        candidate = list(candidates)
+        # If there is a distance function, use that for sorting
+        source = str(input)
+        # Many analyses share the same standardized form, and distance functions
+        # are usually the expensive part, so we compute each distance only once.
+        standardized = list(
+            dict.fromkeys(
+                other.standardized
+                for other in candidate
+                if other.standardized is not None
+            )
+        )
+        distances: dict[str, float]
+        if not standardized:
+            # Nothing to rank, so we do not call the distance functions at all.
+            distances = {}
+        elif batch_function:
+            results = list(batch_function(source, standardized))
+            if len(results) != len(standardized):
+                raise ValueError(
+                    f"The batch distance function returned {len(results)} distances for {len(standardized)} wordforms."
+                )
+            distances = dict(zip(standardized, results))
+        else:
+            assert sort_function is not None
+            distances = {other: sort_function(source, other) for other in standardized}
 
-            def key(other: FullAnalysis) -> float:
-                if other.standardized is None:
-                    return float("+Infinity")
-                return sort_function(source, other.standardized)
+        def key(other: FullAnalysis) -> float:
+            if other.standardized is None:
+                return float("+Infinity")
+            return distances[other.standardized]
 
-            candidate.sort(key=key)
+        if limit is not None:
+            return heapq.nsmallest(limit, candidate, key=key)
+        candidate.sort(key=key)
         return candidate
 
     def generate(self, analysis: FullAnalysis | Analysis | str) -> list[Wordform]:
@@ -284,7 +707,7 @@ class TransducerPair:
         :param analysis: The analysis to generate via the FST.
         """
         input = (
-            "".join(analysis.prefixes) + analysis.lemma + "".join(analysis.suffixes)
+            "".join((*analysis.prefixes, analysis.lemma, *analysis.suffixes))
             if isinstance(analysis, Analysis)
             else analysis
         )
@@ -297,6 +720,9 @@ class TransducerPair:
         is_analyser: bool = False,
         search_cutoff: int = 60,
         default_distance: None | Callable[[str, str], float] = None,
+        default_batch_distance: (
+            None | Callable[[str, list[str]], Iterable[float]]
+        ) = None,
     ):
         """
         Factory Method.  Generates a TransducerPair from a single FST.  You can use the is_analyser argument to tell the direction of the input FST.  Note that the FST will be generated twice before inverting one.
@@ -305,12 +731,14 @@ class TransducerPair:
         :param is_analyser: If true, then the generator FST is generated by inverting.  If false, then the analyser FST is generated by inverting.
         :param search_cutoff: The maximum amount of time (in seconds) that the search will go on for.  The intention of a limit is to avoid search getting stuck.
         :param default_distance: An optional function providing a distance between two strings. (see :py:meth:`hfst_altlab.TransducerPair.analyse`)
+        :param default_batch_distance: An optional function providing the distances between a string and a list of strings, in one call. (see :py:meth:`hfst_altlab.TransducerPair.analyse`)
         """
         object = cls(
             transducer,
             transducer,
             search_cutoff=search_cutoff,
             default_distance=default_distance,
+            default_batch_distance=default_batch_distance,
         )
         if is_analyser:
             object.generator.invert()
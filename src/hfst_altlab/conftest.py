@@ -0,0 +1,60 @@
+"""
+Fixtures shared by the tests in ``transducer_test.py``.
+``import_test.py`` keeps its own fixtures, as it mirrors the upstream compatibility tests.
+"""
+
+from collections.abc import Callable, Iterator
+from pathlib import Path
+import hfst
+import pytest
+
+from . import TransducerFile, TransducerPair
+
+TEST_FST = "crk-relaxed-analyzer-for-dictionary.hfstol"
+
+
+@pytest.fixture(scope="session")
+def project_root_path(request):
+    return request.config.rootpath
+
+
+@pytest.fixture(scope="session")
+def fst_path(project_root_path: Path) -> Path:
+    return project_root_path / TEST_FST
+
+
+# scope="session" reuses the FST for all tests that use this fixture
+@pytest.fixture(scope="session")
+def fst(fst_path: Path) -> TransducerFile:
+    return TransducerFile(fst_path)
+
+
+@pytest.fixture(scope="session")
+def pair(fst_path: Path) -> TransducerPair:
+    """
+    An analyser and a generator (obtained by inverting) for the test FST.
+    """
+    pair: TransducerPair = TransducerPair.duplicate(fst_path, is_analyser=True)
+    return pair
+
+
+@pytest.fixture
+def write_fst(tmp_path: Path) -> Iterator[Callable[[str, str], Path]]:
+    """
+    Compile a regular expression into an (unoptimized) transducer file in a temporary directory.
+    """
+    # hfst.regex uses the global default type, so we restore it after the test.
+    default_type = hfst.get_default_fst_type()
+    hfst.set_default_fst_type(hfst.ImplementationType.TROPICAL_OPENFST_TYPE)
+
+    def write(name: str, regex: str) -> Path:
+        path = tmp_path / name
+        stream = hfst.HfstOutputStream(
+            filename=str(path), type=hfst.ImplementationType.TROPICAL_OPENFST_TYPE
+        )
+        stream.write(hfst.regex(regex))
+        stream.close()
+        return path
+
+    yield write
+    hfst.set_default_fst_type(default_type)
@@ -0,0 +1,283 @@
+"""
+Tests for the functionality that goes beyond the ``hfst-optimized-lookup`` compatibility layer.
+These use the same FST as ``import_test.py``, through the fixtures in ``conftest.py``.
+"""
+
+import gc
+import multiprocessing
+import os
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from . import TransducerFile, TransducerPair
+
+
+def test_repeated_lookup_is_cached(fst_path) -> None:
+    fst = TransducerFile(fst_path)
+    first = fst.lookup("môswa")
+    assert fst.lookup("môswa") == first
+    assert fst._cached_lookup.cache_info().hits >= 1
+
+
+def test_cache_can_be_disabled(fst_path) -> None:
+    fst = TransducerFile(fst_path, cache_size=0)
+    assert fst.lookup("môswa") == ["môswa+N+A+Sg", "môswa+N+A+Obv"]
+    assert fst.lookup("môswa") == ["môswa+N+A+Sg", "môswa+N+A+Obv"]
+    assert fst._cached_lookup.cache_info().hits == 0
+
+
+def test_cache_depends_on_the_cutoff(fst_path) -> None:
+    fst = TransducerFile(fst_path)
+    fst.lookup("môswa")
+    fst.cutoff = 0
+    fst.lookup("môswa")
+    assert fst._cached_lookup.cache_info().misses == 2
+
+
+def test_lookup_reaching_the_cutoff_is_not_cached(
+    write_fst: Callable[[str, str], Path],
+) -> None:
+    fst = TransducerFile(
+        write_fst("infinite.hfst", "a:b [0:c]*"), search_cutoff=1, save_optimized=False
+    )
+    assert fst.lookup("a")
+    assert fst._cached_lookup.cache_info().currsize == 0
+
+
+def test_unused_transducer_file_is_freed(fst_path) -> None:
+    gc.disable()
+    try:
+        fst = weakref.ref(TransducerFile(fst_path))
+        assert fst() is None
+    finally:
+        gc.enable()
+
+
+def test_bulk_lookup_with_repeated_words(fst: TransducerFile) -> None:
+    assert fst.bulk_lookup(["môswa", "itwêwina", "môswa"]) == {
+        "môswa": {"môswa+N+A+Sg", "môswa+N+A+Obv"},
+        "itwêwina": {"itwêwin+N+I+Pl"},
+    }
+
+
+@pytest.mark.parametrize("method", multiprocessing.get_all_start_methods())
+def test_bulk_lookup_with_workers(fst: TransducerFile, method: str) -> None:
+    words = ["itwêwina", "nikî-nipân", "môswa", "avocado"]
+    assert fst.bulk_lookup(
+        words, workers=2, mp_context=multiprocessing.get_context(method)
+    ) == fst.bulk_lookup(words)
+
+
+def test_analyse_computes_each_distance_once(pair: TransducerPair) -> None:
+    calls: list[tuple[str, str]] = []
+
+    def distance(a: str, b: str) -> float:
+        calls.append((a, b))
+        return 0.0
+
+    results = pair.analyse("môswa", distance=distance)
+    assert len(calls) == len(set(calls))
+    assert {b for _, b in calls} == {
+        r.standardized for r in results if r.standardized is not None
+    }
+
+
+def test_analyse_with_batch_distance(pair: TransducerPair) -> None:
+    calls: list[list[str]] = []
+
+    def batch_distance(source: str, others: list[str]) -> list[float]:
+        calls.append(others)
+        return [float(len(other)) for other in others]
+
+    results = pair.analyse("môswa", batch_distance=batch_distance)
+    assert len(calls) == 1
+    assert len(calls[0]) == len(set(calls[0]))
+    assert results == pair.analyse("môswa", distance=lambda _, b: float(len(b)))
+
+
+def test_analyse_without_standardized_forms_skips_batch_distance(
+    pair: TransducerPair,
+) -> None:
+    def batch_distance(source: str, others: list[str]) -> list[float]:
+        raise AssertionError("There is nothing to rank.")
+
+    assert pair.analyse("avocado", batch_distance=batch_distance) == []
+
+
+def test_analyse_with_wrong_number_of_batch_distances(pair: TransducerPair) -> None:
+    with pytest.raises(ValueError):
+        pair.analyse("môswa", batch_distance=lambda source, others: [])
+
+
+def test_loading_the_same_file_reuses_the_transducer(fst_path) -> None:
+    first = TransducerFile(fst_path)
+    second = TransducerFile(fst_path)
+    assert first.transducer is second.transducer
+
+    second.invert()
+    assert first.transducer is not second.transducer
+    assert first.lookup("itwêwina") == ["itwêwin+N+I+Pl"]
+    assert "itwêwina" in second.lookup("itwêwin+N+I+Pl")
+
+
+def test_ilookup_full_analysis(fst: TransducerFile) -> None:
+    analyses = fst.ilookup_full_analysis("môswa")
+    assert not isinstance(analyses, list)
+    assert list(analyses) == fst.weighted_lookup_full_analysis("môswa")
+
+
+def test_analyse_with_limit(pair: TransducerPair) -> None:
+    everything = pair.analyse("môswa")
+    assert pair.analyse("môswa", limit=1) == everything[:1]
+
+    def distance(a: str, b: str) -> float:
+        return float(len(b))
+
+    assert (
+        pair.analyse("môswa", distance=distance, limit=1)
+        == pair.analyse("môswa", distance=distance)[:1]
+    )
+
+
+def test_bulk_lookup_with_workers_on_inverted_transducer(pair: TransducerPair) -> None:
+    analyses = ["itwêwin+N+I+Pl", "môswa+N+A+Sg"]
+    assert pair.generator.bulk_lookup(analyses, workers=2) == (
+        pair.generator.bulk_lookup(analyses)
+    )
+
+
+def test_standardized_only_when_the_generator_agrees(
+    write_fst: Callable[[str, str], Path],
+) -> None:
+    analyser = TransducerFile(
+        write_fst("analyser.hfst", "a:b | c:d | e:f"), save_optimized=False
+    )
+    # The flag diacritics give the generator paths with the same surface form.
+    generator = TransducerFile(
+        write_fst(
+            "generator.hfst",
+            '[b:x "@P.F.1@"] | [b:x "@P.F.2@"] | [b:x "@P.F.3@"] | b:y'
+            ' | d:x | d:y | [f:x "@P.F.1@"] | [f:x "@P.F.2@"]',
+        ),
+        save_optimized=False,
+    )
+
+    def standardized(wordform: str) -> list[str | None]:
+        return [
+            analysis.standardized
+            for analysis in analyser.weighted_lookup_full_analysis(wordform, generator)
+        ]
+
+    # The first two outputs agree, but not all of them: x, x, x, y
+    assert standardized("a") == [None]
+    # The first two outputs disagree: x, y
+    assert standardized("c") == [None]
+    # Every output agrees: x, x
+    assert standardized("e") == ["x"]
+
+
+def test_optimized_transducer_is_saved(
+    write_fst: Callable[[str, str], Path], capsys: pytest.CaptureFixture[str]
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    source.chmod(0o644)
+    assert TransducerFile(source).lookup("a") == ["b"]
+    optimized = source.with_name("fst.hfst.hfstol")
+    assert optimized.stat().st_mode & 0o777 == 0o644
+    assert source.with_name("fst.hfst.hfstol.json").stat().st_mode & 0o777 == 0o644
+    assert "Optimizing" in capsys.readouterr().out
+
+    # Same file, same transducer, even if it is now read from the optimized version.
+    assert TransducerFile(source).transducer is TransducerFile(source).transducer
+
+    TransducerFile._load.cache_clear()
+    assert TransducerFile(source).lookup("a") == ["b"]
+    assert "Optimizing" not in capsys.readouterr().out
+
+
+def test_outdated_optimized_transducer_is_ignored(
+    write_fst: Callable[[str, str], Path], capsys: pytest.CaptureFixture[str]
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    TransducerFile(source)
+    optimized = source.with_name("fst.hfst.hfstol")
+    capsys.readouterr()
+
+    write_fst("fst.hfst", "a:x")
+    older = source.stat().st_mtime_ns - 1_000_000_000
+    os.utime(optimized, ns=(older, older))
+    assert TransducerFile(source).lookup("a") == ["x"]
+    assert "Optimizing" in capsys.readouterr().out
+    assert optimized.stat().st_mtime_ns > older
+
+
+def test_infinitely_ambiguous_warning_survives_saving(
+    write_fst: Callable[[str, str], Path], capsys: pytest.CaptureFixture[str]
+) -> None:
+    source = write_fst("infinite.hfst", "a:b [0:c]*")
+    TransducerFile(source)
+    assert "infinitely ambiguous" in capsys.readouterr().out
+
+    TransducerFile._load.cache_clear()
+    TransducerFile(source)
+    output = capsys.readouterr().out
+    assert "Optimizing" not in output
+    assert "infinitely ambiguous" in output
+
+
+@pytest.mark.parametrize("kept", [0, 2 / 3])
+def test_damaged_optimized_transducer_is_ignored(
+    write_fst: Callable[[str, str], Path],
+    capsys: pytest.CaptureFixture[str],
+    kept: float,
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    TransducerFile(source)
+    optimized = source.with_name("fst.hfst.hfstol")
+    # hfst would abort the process when reading a truncated transducer.
+    data = optimized.read_bytes()
+    optimized.write_bytes(data[: int(len(data) * kept)])
+    capsys.readouterr()
+
+    TransducerFile._load.cache_clear()
+    assert TransducerFile(source, save_optimized=False).lookup("a") == ["b"]
+    assert "Warning" in capsys.readouterr().out
+
+
+def test_optimized_transducer_is_not_saved_on_request(
+    write_fst: Callable[[str, str], Path],
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    assert TransducerFile(source, save_optimized=False).lookup("a") == ["b"]
+    assert list(source.parent.iterdir()) == [source]
+
+
+@pytest.mark.parametrize("method", multiprocessing.get_all_start_methods())
+def test_bulk_lookup_workers_do_not_save_on_request(
+    write_fst: Callable[[str, str], Path], method: str
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    fst = TransducerFile(source, save_optimized=False)
+    assert fst.bulk_lookup(
+        ["a", "c"], workers=2, mp_context=multiprocessing.get_context(method)
+    ) == {"a": {"b"}, "c": {"d"}}
+    assert list(source.parent.iterdir()) == [source]
+
+
+@pytest.mark.skipif(
+    hasattr(os, "geteuid") and os.geteuid() == 0,
+    reason="root can write to read-only directories",
+)
+def test_optimized_transducer_is_not_saved_in_read_only_directory(
+    write_fst: Callable[[str, str], Path],
+) -> None:
+    source = write_fst("fst.hfst", "a:b | c:d")
+    source.parent.chmod(0o555)
+    try:
+        assert TransducerFile(source).lookup("a") == ["b"]
+        assert list(source.parent.iterdir()) == [source]
+    finally:
+        source.parent.chmod(0o755)
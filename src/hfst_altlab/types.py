@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import NamedTuple, Tuple
 from hfst import is_diacritic
 
@@ -77,6 +78,9 @@ class FullAnalysis:
     An analysis for a wordform.  Objects of this class include an analysis, a tuple of tokens (which provides information about flag diacritics), a weight (for weighted FST support), and a space to hold a standardized version of the wordform.
     """
 
+    # Lookups create many of these objects, so we avoid a per-instance __dict__.
+    __slots__ = ("weight", "tokens", "analysis", "standardized")
+
     weight: float
     """
     The weight provided by the FST.  If the FST is not weighted, it is likely to be ``0.0``.
@@ -165,6 +169,8 @@ class Wordform:
     A wordform is the output of passing an analysis to a generator FST.
     """
 
+    __slots__ = ("weight", "tokens", "wordform")
+
     weight: float
     """
     For weighted FSTs, the weight of this particular wordform output.
@@ -224,5 +230,8 @@ def as_fst_input(data: str | FullAnalysis | Wordform) -> str:
         return data.as_fst_input()
 
 
+# The same analyses are converted over and over (e.g. when generating standardized forms),
+# and the tokens are a tuple, so they can be used directly as the cache key.
+@lru_cache(maxsize=4096)
 def fst_output_format(tokens: tuple[str, ...]) -> str:
     return "".join(x for x in tokens if not is_diacritic(x))